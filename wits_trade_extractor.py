@@ -1,5 +1,19 @@
+import asyncio
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import httpx
+import numpy as np
 import pandas as pd
-import requests
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import xlsxwriter
+from numba import njit
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 from io import BytesIO
 from pathlib import Path
 
@@ -40,9 +54,22 @@ EU_COUNTRIES = [
 YEARS = [2020, 2021, 2022, 2023, 2024]
 FLOWS = ["I", "E"]  # I=Import, E=Export
 
+# WITS data for years before CURRENT_YEAR - 1 is treated as final: cached files for
+# those years are used as-is, newer ones are revalidated with a conditional GET
+CURRENT_YEAR = date.today().year
+
 
 
 BASE_URL = "https://wits.worldbank.org/Download.aspx"
+URL_TEMPLATE = (
+    BASE_URL + "?Reporter={reporter_code}&Year={year}&Tradeflow={flow}&Partner=ALL&product={product}"
+    "&Type=HS6Productdata&Lang=en"
+)
+REQUEST_HEADERS = {"User-Agent": "Mozilla/5.0", "Accept": "*/*"}
+REQUEST_TIMEOUT = 120
+
+# Max number of WITS downloads in flight at once (kept modest to be polite to WITS)
+DOWNLOAD_CONCURRENCY = 16
 
 # USD->EUR rates (year: rate)
 USD_TO_EUR = {
@@ -58,6 +85,10 @@ CACHE_DIR = Path("wits_cache")
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 USE_CACHE = True
 
+# Per-partner Kg totals of each cached file, so warm reruns skip the Excel parse entirely
+PARSED_DIR = CACHE_DIR / "parsed"
+PARSED_DIR.mkdir(parents=True, exist_ok=True)
+
 OUT_BASENAME = f"Fur_Trade_Data_HS_{PRODUCTS[0][:4]}"
 
 
@@ -65,78 +96,167 @@ OUT_BASENAME = f"Fur_Trade_Data_HS_{PRODUCTS[0][:4]}"
 # Helpers
 # -----------------------------
 def build_url(reporter_code: str, year: int, flow: str, product: str) -> str:
-    params = (
-        f"Reporter={reporter_code}&Year={year}&Tradeflow={flow}&Partner=ALL&product={product}"
-        f"&Type=HS6Productdata&Lang=en"
-    )
-    return f"{BASE_URL}?{params}"
-
-def download_excel_bytes(url: str) -> bytes:
-    headers = {"User-Agent": "Mozilla/5.0", "Accept": "*/*"}
-    r = requests.get(url, headers=headers, timeout=120)
-    r.raise_for_status()
-    return r.content
-
-def read_by_hs6product_sheet(excel_bytes: bytes) -> pd.DataFrame:
-    bio = BytesIO(excel_bytes)
-    try:
-        return pd.read_excel(bio, sheet_name="By-HS6Product")
-    except ValueError:
-        bio.seek(0)
-        return pd.read_excel(bio, sheet_name=0)
+    return URL_TEMPLATE.format(reporter_code=reporter_code, year=year, flow=flow, product=product)
 
-def _prep_kg_rows(df: pd.DataFrame) -> pd.DataFrame:
-    required = ["Partner", "Quantity", "Quantity Unit", "Trade Value 1000USD"]
-    missing = [c for c in required if c not in df.columns]
-    if missing:
-        raise ValueError(f"Missing expected columns: {missing}. Found: {list(df.columns)}")
+def cache_path_for(reporter_code: str, year: int, flow: str, product: str) -> Path:
+    return CACHE_DIR / f"wits_{reporter_code}_{year}_{flow}_{product}.xlsx"
 
-    d = df.copy()
-    d["Partner"] = d["Partner"].astype(str).str.strip()
+def parsed_path_for(cache_path: Path) -> Path:
+    return PARSED_DIR / f"{cache_path.stem}.sums.parquet"
 
-    # Keep only Kg rows (quantity logic unchanged)
-    d["Quantity Unit"] = d["Quantity Unit"].astype(str).str.strip()
-    d = d[d["Quantity Unit"].str.lower() == "kg"]
+def meta_path_for(cache_path: Path) -> Path:
+    # {etag, last_modified, mtime} of the response the cached file came from
+    return cache_path.with_suffix(".json")
 
-    # Clean numeric columns
-    d["Quantity"] = pd.to_numeric(d["Quantity"], errors="coerce").fillna(0.0)
-    d["Trade Value 1000USD"] = pd.to_numeric(d["Trade Value 1000USD"], errors="coerce").fillna(0.0)
+def conditional_headers(cache_path: Path) -> dict[str, str]:
+    """
+    If-None-Match / If-Modified-Since headers built from the cache entry's sidecar
+    (empty dict when there is no sidecar or the server sent no validators).
+    """
+    meta_path = meta_path_for(cache_path)
+    if not meta_path.exists():
+        return {}
+    try:
+        meta = json.loads(meta_path.read_text())
+    except ValueError:
+        return {}  # unreadable sidecar: treat the entry as having no validators
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+async def fetch(
+    client: httpx.AsyncClient, url: str, extra_headers: dict[str, str]
+) -> tuple[bytes | None, dict[str, str | None]]:
+    """
+    Returns (excel bytes, {etag, last_modified}); bytes is None on 304 Not Modified.
+    """
+    r = await client.get(url, headers=extra_headers)
+    if r.status_code == 304:
+        return None, {}
+    r.raise_for_status()
+    validators = {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+    return r.content, validators
 
-    return d
+def cache_writer(q: queue.Queue) -> None:
+    """
+    Background thread: writes (path, bytes) items from q one at a time. Each file is written
+    to a temp path and renamed into place, so a write cut short never leaves a partial cache
+    entry behind. No fsync, page-cache writeback is fine for a cache that can always be
+    re-downloaded.
+    """
+    while True:
+        path, data = q.get()
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            print(f"Could not write cache file {path}: {exc}")
+            tmp_path.unlink(missing_ok=True)
+        finally:
+            q.task_done()
+
+async def fetch_and_cache(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    url: str,
+    cache_path: Path,
+    extra_headers: dict[str, str],
+    blobs: dict[Path, bytes],
+) -> None:
+    async with semaphore:
+        try:
+            excel_bytes, validators = await fetch(client, url, extra_headers)
+        except httpx.HTTPError as exc:
+            if not extra_headers:
+                raise  # nothing cached to fall back on
+            # Revalidation only: keep using the cached copy rather than failing the whole run
+            print(f"Could not revalidate {cache_path.name} ({exc!r}), using the cached copy")
+            return
+    if excel_bytes is None:
+        # 304: cached copy (and its parsed sums) is still current
+        if not (cache_path.exists() or parsed_path_for(cache_path).exists()):
+            raise RuntimeError(f"WITS answered 304 Not Modified for {url} but there is no cached copy of {cache_path.name}")
+        return
+
+    blobs[cache_path] = excel_bytes
+    if USE_CACHE:
+        # Disk writes go to the background writer; the parse stage reads from blobs
+        CACHE_WRITES.put((cache_path, excel_bytes))
+        meta = {**validators, "mtime": time.time()}
+        CACHE_WRITES.put((meta_path_for(cache_path), json.dumps(meta).encode()))
+        parsed_path_for(cache_path).unlink(missing_ok=True)  # stale once the file changed
+
+async def download_all(jobs: list[tuple[str, int, str, str, str, Path, dict[str, str]]]) -> dict[Path, bytes]:
+    """
+    Downloads every job concurrently (at most DOWNLOAD_CONCURRENCY at a time).
+    Returns dict: cache_path -> excel bytes
+    """
+    blobs: dict[Path, bytes] = {}
+    semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+    # HTTP/2 multiplexes the concurrent requests over a single connection to WITS
+    async with httpx.AsyncClient(
+        http2=True,
+        follow_redirects=True,  # as requests / aiohttp did
+        headers=REQUEST_HEADERS,
+        timeout=REQUEST_TIMEOUT,
+        limits=httpx.Limits(max_connections=DOWNLOAD_CONCURRENCY),
+    ) as client:
+        async with asyncio.TaskGroup() as tg:
+            for _reporter_code, _year, _flow, _product, url, cache_path, extra_headers in jobs:
+                tg.create_task(fetch_and_cache(client, semaphore, url, cache_path, extra_headers, blobs))
+    return blobs
+
+# Only columns read from each sheet, with the types WITS uses for them
+KG_DTYPES = {"Partner": "string", "Quantity": "float64", "Quantity Unit": "string", "Trade Value 1000USD": "float64"}
+KG_COLUMNS = list(KG_DTYPES)
 
-def get_qty_and_value_sums_for_partners(df: pd.DataFrame, partners: list[str]) -> dict[str, tuple[float, float]]:
+def read_by_hs6product_sheet(excel_bytes: bytes) -> pd.DataFrame:
+    # calamine (Rust) parser, much faster than openpyxl for these workbooks;
+    # only KG_COLUMNS are kept, already typed as in KG_DTYPES
+    with pd.ExcelFile(BytesIO(excel_bytes), engine="calamine") as xls:
+        # Sheet picked up front, so column / dtype errors are not mistaken for a missing sheet
+        sheet = "By-HS6Product" if "By-HS6Product" in xls.sheet_names else 0
+        return pd.read_excel(xls, sheet_name=sheet, usecols=KG_COLUMNS, dtype=KG_DTYPES)
+
+@njit(cache=True)
+def _sum_by_partner(partner_idx, is_kg, qty, val1000, n_partners):
+    # Kg rows with partner_idx >= 0 are added into their partner's slot (empty cells are skipped)
+    qty_sum = np.zeros(n_partners)
+    val1000_sum = np.zeros(n_partners)
+    for i in range(partner_idx.shape[0]):
+        j = partner_idx[i]
+        if is_kg[i] and j >= 0:
+            if not np.isnan(qty[i]):
+                qty_sum[j] += qty[i]
+            if not np.isnan(val1000[i]):
+                val1000_sum[j] += val1000[i]
+    return qty_sum, val1000_sum
+
+def reduce_sheet(df: pd.DataFrame, partners: list[str], exclude_set: set[str]) -> tuple[np.ndarray, np.ndarray]:
     """
-    Returns dict: partner -> (quantity_kg_sum, trade_value_1000usd_sum)
+    Sums the Kg rows of a WITS sheet per partner.
+    Returns (quantity_kg_sums, trade_value_1000usd_sums), both aligned with partners, where the
+    "World" slot holds Rest of World, i.e. all Kg rows whose partner is not in exclude_set.
     """
-    d = _prep_kg_rows(df)
+    # Partner name -> slot in partners; -1 = excluded from every sum
+    names = df["Partner"].str.strip()
+    slots = names.map({p: i for i, p in enumerate(partners) if p != "World"})
+    fallback = np.where(names.isin(exclude_set), -1, partners.index("World"))
+    partner_idx = np.where(slots.notna(), slots, fallback).astype(np.int64)
 
-    g = (
-        d[d["Partner"].isin(partners)]
-        .groupby("Partner", as_index=True)[["Quantity", "Trade Value 1000USD"]]
-        .sum()
-    )
+    # Keep only Kg rows (quantity logic unchanged)
+    is_kg = df["Quantity Unit"].str.strip().str.lower().eq("kg").fillna(False).to_numpy(dtype=bool)
 
-    out = {}
-    for p in partners:
-        if p in g.index:
-            out[p] = (float(g.loc[p, "Quantity"]), float(g.loc[p, "Trade Value 1000USD"]))
-        else:
-            out[p] = (0.0, 0.0)
-    return out
+    return _sum_by_partner(
+        partner_idx, is_kg, df["Quantity"].to_numpy(), df["Trade Value 1000USD"].to_numpy(), len(partners)
+    )
 
-def get_rest_of_world_sum(df: pd.DataFrame, exclude_partners: set[str]) -> tuple[float, float]:
-    """
-    Rest of World = sum over ALL partners except:
-      - World
-      - European Union
-      - EU member states listed above
-      - the six BASE_PARTNERS
-    Aggregated on Kg rows.
-    Returns (quantity_kg_sum, trade_value_1000usd_sum)
-    """
-    d = _prep_kg_rows(df)
-    d = d[~d["Partner"].isin(exclude_partners)]
-    return (float(d["Quantity"].sum()), float(d["Trade Value 1000USD"].sum()))
+def read_sheet_sums(excel_bytes: bytes, partners: list[str], exclude_set: set[str]) -> tuple[np.ndarray, np.ndarray]:
+    return reduce_sheet(read_by_hs6product_sheet(excel_bytes), partners, exclude_set)
 
 def inverse_flow(flow: str) -> str:
     return "E" if flow == "I" else "I"
@@ -144,122 +264,175 @@ def inverse_flow(flow: str) -> str:
 def flow_label(flow: str) -> str:
     return "Import" if flow == "I" else "Export"
 
+def _grid_frame(
+    reporters: list[str], partners: list[str], years: list[int], tradeflows: list[str], qty: np.ndarray, val1000: np.ndarray
+) -> pd.DataFrame:
+    """
+    One row per (reporter, partner, year, tradeflow) combination of the given labels, in C order
+    of the matching (reporter, partner, year, flow)-shaped qty / val1000 arrays.
+    """
+    grid = pd.MultiIndex.from_product(
+        [reporters, partners, years, tradeflows], names=["Reporter", "Partner", "Year", "Tradeflow"]
+    ).to_frame(index=False)
+    grid["Quantity in kg"] = qty.ravel()
+    grid["Trade Value 1000USD"] = val1000.ravel()
+    return grid
+
+def _sorted_positions(labels: list) -> list[int]:
+    # Positions of labels in ascending label order
+    return sorted(range(len(labels)), key=labels.__getitem__)
+
+def write_csv(df: pd.DataFrame, path: str) -> None:
+    # Arrow's multithreaded C++ CSV writer. Unlike to_csv it quotes the header and every text
+    # field, and writes whole floats without the trailing ".0" (0.0 -> 0, 4622246.0 -> 4622246)
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), path)
+
+def write_xlsx(df: pd.DataFrame, path: str) -> None:
+    """
+    Writes df to a single-sheet xlsx row by row with xlsxwriter in constant_memory mode
+    (pandas' to_excel emits cells column by column, which constant_memory cannot handle).
+    NaN cells are left empty, like to_excel does.
+    """
+    wb = xlsxwriter.Workbook(path, {"constant_memory": True})
+    try:
+        ws = wb.add_worksheet("Sheet1")
+        ws.write_row(0, 0, list(df.columns))
+        values = df.astype(object).where(df.notna(), None)
+        for r, row in enumerate(values.itertuples(index=False, name=None), start=1):
+            ws.write_row(r, 0, row)
+    finally:
+        wb.close()
+
 # -----------------------------
 # Main aggregation (reporter x partner x year x flow)
 # -----------------------------
-qty_acc = {
-    (reporter, partner, year, flow): 0.0
-    for reporter in REPORTERS.keys()
-    for partner in PARTNERS
-    for year in YEARS
-    for flow in FLOWS
-}
-val1000_acc = {
-    (reporter, partner, year, flow): 0.0
-    for reporter in REPORTERS.keys()
-    for partner in PARTNERS
-    for year in YEARS
-    for flow in FLOWS
-}
-
 EXCLUDE_FOR_ROW = set(BASE_PARTNERS + [REGION_LABEL_EU, "World"] + EU_COUNTRIES)
-
-for reporter_label, reporter_code in REPORTERS.items():
+CACHE_WRITES: queue.Queue[tuple[Path, bytes]] = queue.Queue()
+threading.Thread(target=cache_writer, args=(CACHE_WRITES,), daemon=True).start()
+# Drain the queue at interpreter exit, also when the script stops on an exception, so
+# downloads that already finished are never lost with the daemon writer
+atexit.register(CACHE_WRITES.join)
+
+# Each distinct product code is downloaded and reduced once; a code listed more than
+# once in PRODUCTS still counts that many times in the totals, as before
+PRODUCT_COUNTS = {product: PRODUCTS.count(product) for product in dict.fromkeys(PRODUCTS)}
+
+# Download stage: fetch every file not already cached (or due for revalidation), concurrently
+jobs = []
+for reporter_code in REPORTERS.values():
     for year in YEARS:
         for flow in FLOWS:
-            for product in PRODUCTS:
+            for product in PRODUCT_COUNTS:
+                cache_path = cache_path_for(reporter_code, year, flow, product)
+                # Conditional headers only when a cached copy exists to fall back on a 304;
+                # otherwise the file is fetched unconditionally
+                extra_headers = {}
+                if USE_CACHE and (cache_path.exists() or parsed_path_for(cache_path).exists()):
+                    # Frozen years are never re-requested; recent ones only if there is
+                    # something to revalidate with
+                    extra_headers = conditional_headers(cache_path)
+                    if year < CURRENT_YEAR - 1 or not extra_headers:
+                        continue
                 url = build_url(reporter_code, year, flow, product)
-
-                cache_path = CACHE_DIR / f"wits_{reporter_code}_{year}_{flow}_{product}.xlsx"
-                if USE_CACHE and cache_path.exists():
-                    excel_bytes = cache_path.read_bytes()
+                jobs.append((reporter_code, year, flow, product, url, cache_path, extra_headers))
+
+excel_blobs = asyncio.run(download_all(jobs)) if jobs else {}
+
+# Parse stage: reduce each file to per-partner sums and add them into 4-D accumulators
+# indexed (reporter, partner, year, flow); combinations without matching rows stay 0.0
+R2I = {reporter: i for i, reporter in enumerate(REPORTERS.keys())}
+P2I = {partner: i for i, partner in enumerate(PARTNERS)}
+F2I = {flow: i for i, flow in enumerate(FLOWS)}
+
+qty_acc = np.zeros((len(REPORTERS), len(PARTNERS), len(YEARS), len(FLOWS)))
+val1000_acc = np.zeros_like(qty_acc)
+
+for ri, (reporter_label, reporter_code) in enumerate(REPORTERS.items()):
+    for yi, year in enumerate(YEARS):
+        for fi, flow in enumerate(FLOWS):
+            for product, count in PRODUCT_COUNTS.items():
+                cache_path = cache_path_for(reporter_code, year, flow, product)
+                parsed_path = parsed_path_for(cache_path)
+                if USE_CACHE and parsed_path.exists():
+                    file_sums = pd.read_parquet(parsed_path).set_index("Partner").reindex(PARTNERS, fill_value=0.0)
+                    qty_vec = file_sums["Quantity"].to_numpy()
+                    val1000_vec = file_sums["Trade Value 1000USD"].to_numpy()
                 else:
-                    excel_bytes = download_excel_bytes(url)
-                    if USE_CACHE:
-                        cache_path.write_bytes(excel_bytes)
-
-                sheet_df = read_by_hs6product_sheet(excel_bytes)
+                    if cache_path in excel_blobs:
+                        excel_bytes = excel_blobs[cache_path]
+                    else:
+                        excel_bytes = cache_path.read_bytes()
 
-                # Usual partners (six + World)
-                sums = get_qty_and_value_sums_for_partners(sheet_df, PARTNERS)
-
-                # CHANGE: fill "World" as Rest of World by summing all partners except excluded list
-                row_qty, row_val1000 = get_rest_of_world_sum(sheet_df, EXCLUDE_FOR_ROW)
-                sums["World"] = (row_qty, row_val1000)
+                    # Usual partners (six) + "World" filled as Rest of World
+                    qty_vec, val1000_vec = read_sheet_sums(excel_bytes, PARTNERS, EXCLUDE_FOR_ROW)
+                    if USE_CACHE:
+                        pd.DataFrame(
+                            {"Partner": PARTNERS, "Quantity": qty_vec, "Trade Value 1000USD": val1000_vec}
+                        ).to_parquet(parsed_path, compression="zstd", index=False)
 
-                for partner, (qty, val1000) in sums.items():
-                    qty_acc[(reporter_label, partner, year, flow)] += qty
-                    val1000_acc[(reporter_label, partner, year, flow)] += val1000
+                qty_acc[ri, :, yi, fi] += count * qty_vec
+                val1000_acc[ri, :, yi, fi] += count * val1000_vec
 
 # -----------------------------
 # Build final table:
-# 1) All reporters with partners = BASE_PARTNERS + World (World will later be renamed to Rest of World)
+# 1) All reporters with partners = BASE_PARTNERS + World (World is labelled Rest of World)
 # 2) Extra EU<->Reporter rows: add partner="European Union" for each non-EU reporter using EU data with inverse flow
 # -----------------------------
-rows = []
-
-# Part (1)
-for reporter_label in REPORTERS.keys():
-    for partner in PARTNERS:
-        for year in YEARS:
-            for flow in FLOWS:
-                trade_value_usd = val1000_acc[(reporter_label, partner, year, flow)] * 1000.0
-                eur_rate = USD_TO_EUR.get(year)
-                trade_value_eur = trade_value_usd * eur_rate if eur_rate is not None else float("nan")
-
-                rows.append(
-                    {
-                        "Reporter": reporter_label,
-                        "Partner": partner,
-                        "Tradeflow": flow_label(flow),
-                        "Year": year,
-                        "Quantity in kg": qty_acc[(reporter_label, partner, year, flow)],
-                        "Trade Value USD": trade_value_usd,
-                        "Trade Value EUR": trade_value_eur,
-                    }
-                )
-
-# Part (2) EU<->Reporter rows derived from EU reporter (inverse flow)
-for reporter_label in REPORTERS.keys():
-    if reporter_label == REGION_LABEL_EU:
-        continue
-
-    eu_partner_name = reporter_label  # EU sheet partner names match these labels
-
-    for year in YEARS:
-        for flow in FLOWS:
-            inv = inverse_flow(flow)
-
-            qty_from_eu = qty_acc[(REGION_LABEL_EU, eu_partner_name, year, inv)]
-            val1000_from_eu = val1000_acc[(REGION_LABEL_EU, eu_partner_name, year, inv)]
-
-            trade_value_usd = val1000_from_eu * 1000.0
-            eur_rate = USD_TO_EUR.get(year)
-            trade_value_eur = trade_value_usd * eur_rate if eur_rate is not None else float("nan")
-
-            rows.append(
-                {
-                    "Reporter": reporter_label,
-                    "Partner": REGION_LABEL_EU,
-                    "Tradeflow": flow_label(flow),
-                    "Year": year,
-                    "Quantity in kg": qty_from_eu,
-                    "Trade Value USD": trade_value_usd,
-                    "Trade Value EUR": trade_value_eur,
-                }
-            )
-
-out = pd.DataFrame(rows)
-
-# Remove rows where Reporter and Partner are the same
-out = out[out["Reporter"] != out["Partner"]].copy()
-
-# CHANGE: rename "World" rows (already computed as Rest of World)
-out.loc[out["Partner"] == "World", "Partner"] = "Rest of World"
-
-out = out.sort_values(["Reporter", "Partner", "Year", "Tradeflow"]).reset_index(drop=True)
-
-out.to_csv(f"{OUT_BASENAME}.csv", index=False)
-out.to_excel(f"{OUT_BASENAME}.xlsx", index=False)
+# Per-year EUR rate (NaN when a year has no rate) and per-flow label, looked up once
+EUR_BY_YEAR = {year: USD_TO_EUR.get(year, float("nan")) for year in YEARS}
+FLOW_LABELS = {flow: flow_label(flow) for flow in FLOWS}
+
+# Part (1) lives in qty_acc / val1000_acc as-is. Part (2) becomes one extra partner column:
+# for each non-EU reporter, the EU reporter's figures for that reporter with the inverse flow
+# (EU sheet partner names match the reporter labels). The EU reporter's own cell in that
+# column stays empty and is dropped with the Reporter == Partner rows below.
+non_eu_reporters = [r for r in REPORTERS.keys() if r != REGION_LABEL_EU]
+eu_ri = R2I[REGION_LABEL_EU]
+eu_pi = len(PARTNERS)
+inv_fis = [F2I[inverse_flow(flow)] for flow in FLOWS]
+
+qty_ext = np.zeros((len(REPORTERS), len(PARTNERS) + 1, len(YEARS), len(FLOWS)))
+val1000_ext = np.zeros_like(qty_ext)
+qty_ext[:, :eu_pi] = qty_acc
+val1000_ext[:, :eu_pi] = val1000_acc
+non_eu_ris = [R2I[r] for r in non_eu_reporters]
+eu_pis = [P2I[r] for r in non_eu_reporters]
+qty_ext[non_eu_ris, eu_pi] = qty_acc[eu_ri][eu_pis][:, :, inv_fis]
+val1000_ext[non_eu_ris, eu_pi] = val1000_acc[eu_ri][eu_pis][:, :, inv_fis]
+
+# Output labels per axis. CHANGE: "World" rows (already computed as Rest of World) are labelled as such
+reporter_labels = list(REPORTERS.keys())
+partner_labels = ["Rest of World" if p == "World" else p for p in PARTNERS] + [REGION_LABEL_EU]
+tradeflow_labels = [FLOW_LABELS[flow] for flow in FLOWS]
+
+# Take every axis in sorted label order, so rows come out sorted by
+# Reporter, Partner, Year, Tradeflow without a sort_values pass
+r_pos = _sorted_positions(reporter_labels)
+p_pos = _sorted_positions(partner_labels)
+y_pos = _sorted_positions(YEARS)
+f_pos = _sorted_positions(tradeflow_labels)
+sel = np.ix_(r_pos, p_pos, y_pos, f_pos)
+
+out = _grid_frame(
+    [reporter_labels[i] for i in r_pos],
+    [partner_labels[i] for i in p_pos],
+    [YEARS[i] for i in y_pos],
+    [tradeflow_labels[i] for i in f_pos],
+    qty_ext[sel],
+    val1000_ext[sel],
+)
+out["Trade Value USD"] = out.pop("Trade Value 1000USD") * 1000.0
+out["Trade Value EUR"] = out["Trade Value USD"] * out["Year"].map(EUR_BY_YEAR).to_numpy()
+out = out[["Reporter", "Partner", "Tradeflow", "Year", "Quantity in kg", "Trade Value USD", "Trade Value EUR"]]
+
+# Remove rows where Reporter and Partner are the same (keeps the sorted order)
+out = out[out["Reporter"] != out["Partner"]].reset_index(drop=True)
+
+# Both output files are written at the same time
+with ThreadPoolExecutor(max_workers=2) as ex:
+    csv_job = ex.submit(write_csv, out, f"{OUT_BASENAME}.csv")
+    xlsx_job = ex.submit(write_xlsx, out, f"{OUT_BASENAME}.xlsx")
+    csv_job.result()
+    xlsx_job.result()
 
 print(out)
\ No newline at end of file
@@ -37,6 +37,7 @@ import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 
 # ============================================================================
 # Configuration — edit these dictionaries to customise the analysis
@@ -131,6 +132,18 @@ USE_CACHE: bool = True
 BASE_URL: str = "https://wits.worldbank.org/Download.aspx"
 """Base URL for the WITS bulk-download endpoint."""
 
+WITS_URL_TEMPLATE: str = (
+    BASE_URL
+    + "?Reporter={reporter_code}"
+    "&Year={year}"
+    "&Tradeflow={trade_flow}"
+    "&Partner=ALL"
+    "&product={product_code}"
+    "&Type=HS6Productdata"
+    "&Lang=en"
+)
+"""Query URL with placeholders, filled in by :func:`build_wits_url`."""
+
 REQUEST_HEADERS: dict[str, str] = {
     "User-Agent": "Mozilla/5.0",
     "Accept": "*/*",
@@ -140,6 +153,9 @@ REQUEST_HEADERS: dict[str, str] = {
 REQUEST_TIMEOUT: int = 120
 """Timeout in seconds for each HTTP request."""
 
+POOL_SIZE: int = 16
+"""Number of keep-alive connections the shared HTTP session keeps open."""
+
 RETRY_ATTEMPTS: int = 3
 """Number of retry attempts for failed downloads."""
 
@@ -187,21 +203,43 @@ def build_wits_url(
     Returns:
         The complete URL string ready for an HTTP GET request.
     """
-    params = (
-        f"Reporter={reporter_code}"
-        f"&Year={year}"
-        f"&Tradeflow={trade_flow}"
-        f"&Partner=ALL"
-        f"&product={product_code}"
-        f"&Type=HS6Productdata"
-        f"&Lang=en"
+    return WITS_URL_TEMPLATE.format(
+        reporter_code=reporter_code,
+        year=year,
+        trade_flow=trade_flow,
+        product_code=product_code,
     )
-    return f"{BASE_URL}?{params}"
+
+
+def _build_session() -> requests.Session:
+    """Create the HTTP session shared by every WITS download.
+
+    Re-using one session keeps connections to WITS alive between requests,
+    so each download after the first skips the TCP and TLS handshakes.
+
+    Returns:
+        A :class:`requests.Session` with ``REQUEST_HEADERS`` set and a
+        connection pool of ``POOL_SIZE`` for HTTPS.
+    """
+    session = requests.Session()
+    session.headers.update(REQUEST_HEADERS)
+    session.mount(
+        "https://",
+        HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE),
+    )
+    return session
+
+
+SESSION: requests.Session = _build_session()
+"""Shared keep-alive session used by :func:`download_excel_bytes`."""
 
 
 def download_excel_bytes(url: str) -> bytes:
     """Download binary content from a URL with retry logic.
 
+    Requests go through the shared :data:`SESSION`, so connections to WITS
+    are re-used across downloads.
+
     Args:
         url: The URL to fetch.
 
@@ -213,9 +251,7 @@ def download_excel_bytes(url: str) -> bytes:
     """
     for attempt in range(1, RETRY_ATTEMPTS + 1):
         try:
-            response = requests.get(
-                url, headers=REQUEST_HEADERS, timeout=REQUEST_TIMEOUT
-            )
+            response = SESSION.get(url, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             return response.content
         except requests.RequestException as exc:
@@ -271,11 +307,14 @@ def extract_partner_quantities(df: pd.DataFrame) -> dict[str, float]:
         logger.warning("Missing columns %s — returning empty dict.", missing)
         return {}
 
-    data = df.copy()
-    data["Partner"] = data["Partner"].astype(str).str.strip()
-    data["Quantity Unit"] = data["Quantity Unit"].astype(str).str.strip()
-    data = data[data["Quantity Unit"].str.lower() == "kg"]
-    data["Quantity"] = pd.to_numeric(data["Quantity"], errors="coerce").fillna(0.0)
+    # Filter to Kg rows first — boolean indexing already returns a new frame,
+    # so the full sheet never needs to be copied
+    unit = df["Quantity Unit"].astype(str).str.strip().str.lower()
+    data = df.loc[unit == "kg", ["Partner", "Quantity"]]
+    data = data.assign(
+        Partner=data["Partner"].astype(str).str.strip(),
+        Quantity=pd.to_numeric(data["Quantity"], errors="coerce").fillna(0.0),
+    )
 
     # Exclude aggregate rows
     data = data[~data["Partner"].isin(["World", ""])]